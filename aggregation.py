@@ -0,0 +1,118 @@
+"""Derived tables of the crimes dataset.
+
+All yearly, percentage and seasonal tables are built together, for every count column at once, and cached per
+dataset content hash in the process-wide ``shared.shared_store``, so the report only reads from them instead of
+regrouping the monthly frame on every rerun or in every session.
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data import count_columns, data_fingerprint, load_crime_data
+from profiling import profile
+from seasonality import Seasonality, build_seasonality
+from shared import shared_store
+from snapshot import snapshot_value
+
+STATISTICS = ["mean", "median", "std"]
+
+
+def round_percentage(number, total):
+    return float(np.round(number / total * 100, decimals=2))
+
+
+def year_percentage(table):
+    """Percentage of each row out of the column total, for a column or for every column of a table."""
+    return (table / table.sum() * 100).round(2)
+
+
+@dataclass(frozen=True)
+class CrimeCube:
+    monthly: pd.DataFrame
+    yearly: pd.DataFrame
+    percent: pd.DataFrame
+    seasonal_sum: pd.DataFrame
+    seasonal: pd.DataFrame
+    seasonality: Seasonality
+    totals: pd.Series
+    monthly_stats: pd.DataFrame
+    yearly_stats: pd.DataFrame
+    complete_years: list
+    incomplete_years: list
+    # Content hash of the dataset, when known; derived caches (e.g. decimated series) are keyed by it.
+    fingerprint: str = None
+
+    @property
+    def n_years(self):
+        return len(self.complete_years)
+
+    @property
+    def columns(self):
+        return list(self.yearly.columns)
+
+
+def build_cube(df, fingerprint=None):
+    columns = count_columns(df)
+    # Minor is approximately "non-serious": total minus serious (types of crimes may intersect).
+    monthly = pd.concat([df, (df["Total_crimes"] - df["Serious"]).rename("Minor")], axis=1)
+    columns = columns + ["Minor"]
+
+    # Only years with all 12 months give valid yearly and seasonal sums (e.g. 2020 has only January).
+    months_per_year = monthly.groupby("year")["month_only"].nunique()
+    complete_years = [int(year) for year in months_per_year.index[months_per_year == 12]]
+    incomplete_years = [int(year) for year in months_per_year.index[months_per_year < 12]]
+    complete = monthly[monthly["year"].isin(complete_years)]
+    # Sums over many rows may not fit into the compact int32 column dtypes.
+    counts = complete[columns].astype({column: np.int64 for column in columns
+                                       if pd.api.types.is_integer_dtype(complete[column])})
+
+    # One grouping by (year, month of the year); complete years have all 12 months, so the sums fill a
+    # (years, 12, columns) array from which the yearly and seasonal tables are plain axis sums.
+    with profile("groupby: year and month"):
+        sums = counts.groupby([complete["year"].to_numpy(), complete["month_only"].cat.codes.to_numpy()]).sum()
+    matrix = sums.to_numpy().reshape(len(complete_years), 12, len(columns))
+    with profile("seasonality"):
+        seasonality = build_seasonality(matrix, complete_years, columns)
+    dtypes = counts.dtypes.to_dict()
+    yearly = pd.DataFrame(matrix.sum(axis=1), index=pd.Index(complete_years, name="year"),
+                          columns=columns).astype(dtypes)
+    seasonal_sum = seasonality.frame("sums").astype(dtypes)
+    # For each month of the year, the average is the integer part of the sum over the complete years.
+    seasonal = seasonality.frame("averages").astype(dtypes)
+    with profile("statistics"):
+        percent = year_percentage(yearly)
+        totals = monthly[columns].sum()
+        monthly_stats = monthly[columns].agg(STATISTICS)
+        yearly_stats = yearly.agg(STATISTICS)
+
+    return CrimeCube(
+        monthly=monthly,
+        yearly=yearly,
+        percent=percent,
+        seasonal_sum=seasonal_sum,
+        seasonal=seasonal,
+        seasonality=seasonality,
+        totals=totals,
+        monthly_stats=monthly_stats,
+        yearly_stats=yearly_stats,
+        complete_years=complete_years,
+        incomplete_years=incomplete_years,
+        fingerprint=fingerprint,
+    )
+
+
+def load_cube(path="crime.csv"):
+    """Cube for the dataset at ``path``, rebuilt only when the dataset content changes."""
+    digest = data_fingerprint(path)
+
+    def build():
+        cube = snapshot_value(path, "cube", digest)
+        if cube is not None:
+            return cube
+        df = load_crime_data(path)
+        with profile("aggregation"):
+            return build_cube(df, digest)
+
+    return shared_store.get(("cube", os.path.abspath(path)), digest, build)
@@ -0,0 +1,234 @@
+"""Benchmarks of every stage of the app on synthetic datasets.
+
+Synthetic datasets have the schema of ``crime.csv`` (optionally with extra crime columns) and ``scale`` times its
+rows: every month is repeated ``scale`` times, like a per-region export, with counts drawn around the real monthly
+values. Every stage is timed separately (best of ``--repeat`` runs) together with its peak traced memory:
+
+* ``csv_load``: reading the CSV text into a frame;
+* ``date_parsing``: parsing the month column;
+* ``typed_load``: the whole typed loader (``data.parse_crime_csv``);
+* ``streaming_load``: the chunked loader (``streaming.stream_crime_csv``);
+* ``aggregation``: yearly/seasonal grouping and statistics (``aggregation.build_cube``);
+* ``year_percentage``: the per-year percentages of every column;
+* ``figure:<plot>(<arguments>)``: rendering each figure of the report;
+* ``full_rerun``: building every section and rendering all its figures, as a rerun of the app without caches;
+* ``cold_imports`` / ``cold_first_render``: in a new interpreter, importing the app's modules and building its first
+  page (introduction and conclusion), as a new server process does; ``cold_first_render_snapshot`` is the same with
+  the snapshot of the dataset on disk (see ``snapshot.py``). Their ``peak_mb`` is not measured.
+
+Usage::
+
+    python benchmark.py --scales 1,100,10000 --output bench.json
+    python benchmark.py --scales 1,100 --compare bench.json --threshold 0.25
+
+With ``--compare`` the exit status is 1 when a stage got slower, or its peak memory grew, by more than the threshold
+against the baseline. The
+exit status is also 1 when the chunked loader is outside its documented tolerances on a dataset (checked with a chunk
+size of a quarter of the rows, so that chunks are merged).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from aggregation import build_cube, year_percentage
+from data import DATE_COLUMN, DATE_FORMAT, parse_crime_csv
+from figure_cache import render_figure
+from sections import SECTIONS, Section, conclusion, introduction
+from snapshot import build_snapshot
+from streaming import check_tolerances, stream_crime_csv
+
+# Differences below this many seconds or megabytes are noise and never count as regressions.
+MIN_REGRESSION_SECONDS = 0.01
+MIN_REGRESSION_MB = 1
+
+# Run in a new interpreter: the imports of app.py, then its first page.
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+import pandas, aggregation, data, figure_cache, sections, snapshot
+imported = time.perf_counter()
+sections.build_introduction(sys.argv[1])
+sections.conclusion(sections.Section())
+print(json.dumps({"imports": imported - started, "first_render": time.perf_counter() - started,
+                  "matplotlib": "matplotlib" in sys.modules}))
+"""
+
+
+def synthetic_csv(path, scale=1, extra_columns=0, source="crime.csv", seed=0):
+    """Write a dataset with the schema of ``source``, ``scale`` times its rows and ``extra_columns`` more counts.
+
+    Returns the number of rows written.
+    """
+    random = np.random.default_rng(seed)
+    base = pd.read_csv(source)
+    counts = base.drop(columns=DATE_COLUMN)
+    # Added in one concat: inserting hundreds of columns one by one fragments the frame.
+    extra = pd.DataFrame({f"Extra_{index + 1}": counts.iloc[:, index % counts.shape[1]]
+                          for index in range(extra_columns)}, index=counts.index)
+    counts = pd.concat([counts, extra], axis=1)
+    values = np.repeat(counts.to_numpy(), scale, axis=0)
+    values = np.round(values * random.lognormal(0, 0.1, values.shape))
+    df = pd.DataFrame(values, columns=counts.columns)
+    df.insert(0, DATE_COLUMN, np.repeat(base[DATE_COLUMN].to_numpy(), scale))
+    df.to_csv(path, index=False, float_format="%.1f")
+    return len(df)
+
+
+def measure(function, repeat=1):
+    """Best wall time of ``repeat`` calls and the peak traced memory of one call, in MB."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_mb": peak / 1024 / 1024}
+
+
+def report_figures(cube):
+    sections = []
+    for _, build in SECTIONS:
+        section = Section()
+        build(section, cube)
+        sections.append(section)
+    return [content for section in sections for kind, content in section.blocks if kind == "figure"]
+
+
+def cold_start(path, repeat=1):
+    """Best import time and time to the first page of ``repeat`` new interpreters, in seconds."""
+    best = {"imports": float("inf"), "first_render": float("inf")}
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", COLD_START, os.path.abspath(path)], capture_output=True,
+                                text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        timings = json.loads(output)
+        if timings["matplotlib"]:
+            print("warning: matplotlib is imported before the first figure", file=sys.stderr)
+        best = {name: min(seconds, timings[name]) for name, seconds in best.items()}
+    return best
+
+
+def full_rerun(path):
+    df = parse_crime_csv(path)
+    cube = build_cube(df)
+    introduction(Section(), df)
+    for plot, args in report_figures(cube):
+        render_figure(plot(cube, *args))
+    conclusion(Section())
+
+
+def benchmark_dataset(path, repeat=1):
+    results = {}
+    results["csv_load"] = measure(lambda: pd.read_csv(path), repeat)
+    raw = pd.read_csv(path, usecols=[DATE_COLUMN], dtype={DATE_COLUMN: "str"})
+    results["date_parsing"] = measure(lambda: pd.to_datetime(raw[DATE_COLUMN], format=DATE_FORMAT), repeat)
+    results["typed_load"] = measure(lambda: parse_crime_csv(path), repeat)
+    results["streaming_load"] = measure(lambda: stream_crime_csv(path), repeat)
+    df = parse_crime_csv(path)
+    results["aggregation"] = measure(lambda: build_cube(df), repeat)
+    cube = build_cube(df)
+    results["year_percentage"] = measure(lambda: year_percentage(cube.yearly), repeat)
+    for plot, args in report_figures(cube):
+        name = f"figure:{plot.__name__}({', '.join(repr(arg) for arg in args)})"
+        results[name] = measure(lambda: render_figure(plot(cube, *args)), repeat)
+    results["full_rerun"] = measure(lambda: full_rerun(path), repeat)
+    cold = cold_start(path, repeat)
+    results["cold_imports"] = {"seconds": cold["imports"], "peak_mb": None}
+    results["cold_first_render"] = {"seconds": cold["first_render"], "peak_mb": None}
+    build_snapshot(path)
+    results["cold_first_render_snapshot"] = {"seconds": cold_start(path, repeat)["first_render"], "peak_mb": None}
+    return results
+
+
+def run(scales, extra_columns=0, repeat=1, directory=None):
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as temporary:
+        for scale in scales:
+            path = os.path.join(temporary, f"crime_x{scale}.csv")
+            rows = synthetic_csv(path, scale, extra_columns)
+            key = f"x{scale}" + (f"+{extra_columns}" if extra_columns else "")
+            results[key] = {"rows": rows, "file_mb": os.path.getsize(path) / 1024 / 1024,
+                            "stages": benchmark_dataset(path, repeat),
+                            "streaming_errors": check_tolerances(path, chunk_size=max(rows // 4, 1))}
+            print(f"{key}: full rerun {results[key]['stages']['full_rerun']['seconds']:.2f} s", file=sys.stderr)
+    return {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "pandas": pd.__version__, "numpy": np.__version__, "machine": platform.machine(),
+                 "extra_columns": extra_columns, "repeat": repeat},
+        "results": results,
+    }
+
+
+def regressions(current, baseline, threshold):
+    """Stages slower or with a higher peak memory than in ``baseline`` by more than ``threshold`` (a fraction)."""
+    found = []
+    for dataset, result in current["results"].items():
+        base_stages = baseline["results"].get(dataset, {}).get("stages", {})
+        for stage, timing in result["stages"].items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+            slower = timing["seconds"] - base["seconds"]
+            if slower > MIN_REGRESSION_SECONDS and timing["seconds"] > base["seconds"] * (1 + threshold):
+                found.append(f"{dataset} {stage}: {base['seconds']:.3f} s -> {timing['seconds']:.3f} s")
+            if timing.get("peak_mb") is None or base.get("peak_mb") is None:
+                continue
+            larger = timing["peak_mb"] - base["peak_mb"]
+            if larger > MIN_REGRESSION_MB and timing["peak_mb"] > base["peak_mb"] * (1 + threshold):
+                found.append(f"{dataset} {stage}: peak {base['peak_mb']:.1f} MB -> {timing['peak_mb']:.1f} MB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the app on synthetic datasets.")
+    parser.add_argument("--scales", default="1,100,10000",
+                        help="comma separated row multipliers (default: 1,100,10000)")
+    parser.add_argument("--extra-columns", type=int, default=0, help="number of extra crime columns")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best one is kept (default: 3)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction (default: 0.25)")
+    arguments = parser.parse_args()
+
+    results = run([int(scale) for scale in arguments.scales.split(",")], arguments.extra_columns, arguments.repeat)
+    text = json.dumps(results, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    failed = False
+    for dataset, result in results["results"].items():
+        for line in result["streaming_errors"]:
+            print(f"streaming tolerance: {dataset} {line}", file=sys.stderr)
+            failed = True
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            found = regressions(results, json.load(file), arguments.threshold)
+        for line in found:
+            print("regression:", line, file=sys.stderr)
+        failed = failed or bool(found)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Loading of the crimes dataset.
+
+The CSV is parsed once into a typed frame (dates parsed, counts stored as integers, year and month of the year
+derived) and kept in the process-wide ``shared.shared_store``, so all sessions share one read-only copy. The entry is
+reused as long as the file's modification time and size are unchanged; if they change, the content hash decides
+whether the file really has to be parsed again. The frame is read from the columnar copy made by ``store.py`` when
+possible; files larger than ``CRIME_STREAMING_MB`` are read in chunks by ``streaming.py`` instead of being loaded
+whole.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from profiling import profile
+from shared import shared_store
+
+DATE_COLUMN = "month"
+DATE_FORMAT = "%d.%m.%Y"
+CRIME_COLUMNS = ["Total_crimes", "Serious", "Huge_damage", "Ecological", "Terrorism", "Extremism", "Murder",
+                 "Harm_to_health", "Rape", "Theft", "Vehicle_theft", "Fraud_scam", "Hooligan", "Drugs", "Weapons"]
+DERIVED_COLUMNS = ["year", "month_only"]
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_version(modules):
+    """Hash of the source files of the app's ``modules``, to tell results stored on disk by other code apart."""
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(content_hash(os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")).encode())
+    return digest.hexdigest()
+
+
+def count_columns(df):
+    """Crime count columns of a loaded frame: the known ones first, then any extra ones from extended exports."""
+    extra = [column for column in df.columns
+             if column not in CRIME_COLUMNS and column != DATE_COLUMN and column not in DERIVED_COLUMNS]
+    return [column for column in CRIME_COLUMNS if column in df.columns] + extra
+
+
+def compact_counts(column):
+    # Counts are stored as floats ("214587.0"); keep floats only where there are gaps or fractions.
+    # int32 rather than the smallest fitting type, so that arithmetic on the columns cannot silently overflow.
+    values = column.to_numpy()
+    if np.isnan(values).any() or not np.array_equal(values, np.floor(values)):
+        return column
+    if np.abs(values).max(initial=0) < np.iinfo(np.int32).max:
+        return column.astype(np.int32)
+    return column.astype(np.int64)
+
+
+def add_calendar_columns(df):
+    # Concatenated rather than inserted: frames read from the store have one block per column, and inserting into a
+    # wide one makes pandas warn about fragmentation.
+    calendar = pd.DataFrame({
+        "year": df[DATE_COLUMN].dt.year.astype(np.int32),
+        "month_only": pd.Categorical.from_codes(df[DATE_COLUMN].dt.month.to_numpy() - 1,
+                                                categories=MONTH_NAMES, ordered=True),
+    }, index=df.index)
+    return pd.concat([df, calendar], axis=1)
+
+
+def parse_crime_csv(path):
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {column: "float64" for column in header if column != DATE_COLUMN}
+    dtypes[DATE_COLUMN] = "str"
+    df = pd.read_csv(path, dtype=dtypes)
+    # The converted columns are put together into a new frame at once; assigning them one by one fragments wide
+    # exports (hundreds of columns).
+    converted = {column: compact_counts(df[column]) for column in count_columns(df)}
+    converted[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT)
+    return add_calendar_columns(pd.DataFrame({column: converted[column] for column in df.columns}))
+
+
+def select_columns(df, columns):
+    """Projection of a loaded frame on the date, the given count columns and the calendar columns."""
+    if columns is None:
+        return df
+    return df[[DATE_COLUMN] + [column for column in columns if column not in (DATE_COLUMN, *DERIVED_COLUMNS)]
+              + DERIVED_COLUMNS]
+
+
+def read_crime_data(path, columns=None):
+    from store import load_columns
+    from streaming import should_stream
+
+    # Large per-day or per-region exports are reduced to monthly sums while being read in chunks.
+    if should_stream(path):
+        return select_columns(load_stream_summary(path).monthly, columns)
+    return load_columns(path, columns)
+
+
+def load_stream_summary(path="crime.csv"):
+    """Summary of the export at ``path`` read in chunks (see ``streaming.py``): monthly sums and per-row statistics."""
+    from streaming import stream_crime_csv
+
+    with profile("load: streaming"):
+        return shared_store.get(("stream", os.path.abspath(path)), current_digest(path), lambda: stream_crime_csv(path))
+
+
+def current_digest(path):
+    # Hashed again only when the modification time or size changed; a touched file with identical content keeps its
+    # digest, so the entries keyed by it stay valid.
+    return shared_store.get(("digest", os.path.abspath(path)), file_stamp(path), lambda: content_hash(path))
+
+
+def load_crime_data(path="crime.csv", columns=None):
+    """Typed crimes frame for ``path``, as a view of the copy shared by all sessions.
+
+    With ``columns``, only the date, those count columns and the calendar columns are read (for scripts that need a few
+    columns; the app needs all of them for the cube).
+    """
+    key = ("data", os.path.abspath(path), None if columns is None else tuple(columns))
+    with profile("load"):
+        return shared_store.get(key, current_digest(path), lambda: read_crime_data(path, columns))
+
+
+def data_fingerprint(path="crime.csv"):
+    """Content hash of the dataset at ``path``, usable as a key for derived results."""
+    return current_digest(path)
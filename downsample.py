@@ -0,0 +1,92 @@
+"""Decimation of long series before plotting.
+
+A figure cannot show more points than it has pixels across, so series longer than that are reduced to about one
+point per pixel before being drawn:
+
+* ``minmax_indices`` keeps the smallest and the largest value of every pixel-wide bucket, so every peak and dip
+  stays visible (used for scatter plots);
+* ``lttb_indices`` is Largest-Triangle-Three-Buckets, which keeps the points that shape the line the most (used for
+  line plots).
+
+Both return the indices of the points to keep, in order. ``plot_indices`` caches them per (dataset, series, width).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def target_points(width_inches, dpi):
+    return int(width_inches * dpi)
+
+
+def minmax_indices(y, points):
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= points:
+        return valid
+    values = y[valid]
+    buckets = max(points // 2, 1)
+    bucket = np.arange(len(values)) * buckets // len(values)
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    kept = []
+    for extreme in (np.minimum, np.maximum):
+        # First point of every bucket that equals the bucket's extreme value.
+        matches = np.flatnonzero(values == extreme.reduceat(values, starts)[bucket])
+        kept.append(matches[np.unique(bucket[matches], return_index=True)[1]])
+    return valid[np.unique(np.concatenate(kept))]
+
+
+def lttb_indices(x, y, points):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= points or points < 3:
+        return valid
+    x, y = x[valid], y[valid]
+    n = len(y)
+    # The first and the last point are always kept; the others are split into points - 2 buckets.
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket == points - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_end = edges[bucket + 2]
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # Area of the triangle formed by the previously kept point, each candidate and the next bucket's average.
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return valid[selected]
+
+
+def plot_indices(x, y, points, method="lttb", key=None):
+    """Indices to plot for the series ``(x, y)``; cached under ``key`` (e.g. dataset fingerprint and column)."""
+    if key is not None:
+        key = (key, points, method)
+        with _lock:
+            indices = _cache.get(key)
+            if indices is not None:
+                _cache.move_to_end(key)
+                return indices
+    if method == "minmax":
+        indices = minmax_indices(y, points)
+    else:
+        indices = lttb_indices(x, y, points)
+    if key is not None:
+        indices.setflags(write=False)
+        with _lock:
+            _cache[key] = indices
+            if len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return indices
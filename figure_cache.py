@@ -0,0 +1,120 @@
+"""Cache of rendered figures.
+
+Figures only change when the data changes, so they are rendered once per (data fingerprint, plot spec) key, format
+and DPI and kept as PNG/SVG bytes. The in-memory tier is a least recently used cache bounded by the total size of
+the stored images; an optional on-disk tier (``CRIME_FIGURE_CACHE_DIR``) keeps images between server restarts. Its
+file names also include a hash of the plotting code (``PLOT_MODULES``), so a server restarted with changed plots does
+not serve images drawn by the old ones.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from data import source_version
+from shared import SingleFlight
+
+DEFAULT_MAX_BYTES = int(os.environ.get("CRIME_FIGURE_CACHE_MB", "64")) * 1024 * 1024
+DEFAULT_DPI = 200
+# Modules whose code determines how the figures look.
+PLOT_MODULES = ["plots", "downsample", "figure_cache"]
+
+
+def pyplot():
+    # matplotlib takes longer to import than pandas and the app together, so it is imported with the first figure
+    # rather than when the server process starts.
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def render_figure(fig, fmt="png", dpi=DEFAULT_DPI):
+    """Bytes of ``fig`` in the given format; the figure is closed afterwards."""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+    finally:
+        pyplot().close(fig)
+    return buffer.getvalue()
+
+
+class FigureCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self.code_version = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.code_version = source_version(PLOT_MODULES)
+
+    def _path(self, key, fmt):
+        name = hashlib.sha256(repr((key, self.code_version)).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.{fmt}")
+
+    def _remember(self, key, image):
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = image
+            self.size += len(image)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get(self, key, fmt="png", dpi=DEFAULT_DPI):
+        key = (key, fmt, dpi)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+        if self.directory:
+            path = self._path(key, fmt)
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    image = file.read()
+                self._remember(key, image)
+                self.hits += 1
+                return image
+        return None
+
+    def render(self, key, draw, fmt="png", dpi=DEFAULT_DPI):
+        """Cached image for ``key``; ``draw()`` must return a new matplotlib figure and is only called on a miss.
+
+        Sessions asking for the same missing image at the same time wait for one rendering of it.
+        """
+        image = self.get(key, fmt, dpi)
+        if image is not None:
+            return image
+        return self._flights.run((key, fmt, dpi), lambda: self._render(key, draw, fmt, dpi))
+
+    def _render(self, key, draw, fmt, dpi):
+        image = self.get(key, fmt, dpi)
+        if image is not None:
+            return image
+        self.misses += 1
+        image = render_figure(draw(), fmt=fmt, dpi=dpi)
+        self._remember((key, fmt, dpi), image)
+        if self.directory:
+            path = self._path((key, fmt, dpi), fmt)
+            # Write to a temporary file first so that concurrent readers never see a partial image.
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as file:
+                file.write(image)
+            os.replace(temporary, path)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.size = 0
+
+
+figure_cache = FigureCache(directory=os.environ.get("CRIME_FIGURE_CACHE_DIR"))
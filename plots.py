@@ -0,0 +1,114 @@
+"""Figures of the report.
+
+Every function takes the aggregation cube (plus plain parameters describing the plot) and returns a new matplotlib
+figure, so that figures can be rendered once and cached by ``figure_cache``. matplotlib is only imported when the
+first figure is drawn.
+"""
+import numpy as np
+
+from downsample import plot_indices, target_points
+from figure_cache import DEFAULT_DPI, pyplot
+
+
+def set_year_ticks(ax, cube):
+    ax.set_xticks(range(0, len(cube.yearly.index)), cube.yearly.index)
+
+
+def decimated(cube, column, width, method="lttb"):
+    """Rows of the monthly frame to plot for ``column`` on a figure ``width`` inches wide (about one per pixel)."""
+    monthly = cube.monthly
+    x = monthly["month"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+    key = None if cube.fingerprint is None else (cube.fingerprint, column)
+    indices = plot_indices(x, monthly[column].to_numpy(), target_points(width, DEFAULT_DPI), method, key)
+    return monthly if len(indices) == len(monthly) else monthly.iloc[indices]
+
+
+def mark_januaries(ax, cube):
+    for january in cube.monthly["month"][cube.monthly["month_only"] == "Jan"].unique():
+        ax.axvline(x=january, ymin=0, ymax=1, color="crimson", linewidth=0.5, ls="--")
+
+
+def total_per_month(cube):
+    from matplotlib.dates import YearLocator
+
+    fig, ax = pyplot().subplots(1, 1, figsize=(39, 7))
+    # Min/max decimation keeps every peak and dip of a long series visible on the scatter plot.
+    points = decimated(cube, "Total_crimes", 39, "minmax")
+    ax.scatter(points["month"], points["Total_crimes"], color="black")
+    ax.set_title("All crimes over time")
+    ax.set_xlabel("month")
+    ax.set_ylabel("Total_crimes")
+    ax.xaxis.set_major_locator(YearLocator())
+    ax.tick_params(axis="x", labelrotation=90)
+    ax.axhline(y=int(cube.monthly_stats.Total_crimes["mean"]), color="crimson", label="mean", linewidth=2)
+    ax.legend(fontsize="18")
+    return fig
+
+
+def yearly_trend(cube, column, title, area=False, color="black", linewidth=2):
+    fig, ax = pyplot().subplots(1, 1, figsize=(15, 7))
+    plot = cube.yearly.reset_index(drop=True).plot
+    (plot.area if area else plot.line)(ax=ax, y=column, color=color, ylabel="number of cases", title=title)
+    ax.axhline(y=int(cube.yearly_stats[column]["mean"]), color="crimson", label="mean", linewidth=linewidth, ls="--")
+    ax.legend()
+    set_year_ticks(ax, cube)
+    return fig
+
+
+def percent_lines(cube, columns, colors, title):
+    fig, ax = pyplot().subplots(1, 1, figsize=(15, 7))
+    cube.percent.reset_index(drop=True).plot(ax=ax, y=list(columns), rot=0, color=list(colors),
+                                             ylabel="percentage of cases per year", title=title)
+    set_year_ticks(ax, cube)
+    return fig
+
+
+def percent_bars(cube, groups):
+    """One bar chart per (columns, colors, title) group, stacked vertically."""
+    fig, axes = pyplot().subplots(nrows=len(groups), figsize=(15, 7 * len(groups)), squeeze=False)
+    for ax, (columns, colors, title) in zip(axes[:, 0], groups):
+        cube.percent.plot.bar(ax=ax, y=list(columns), color=list(colors), rot=0,
+                              ylabel="percentage of cases per year", title=title)
+    return fig
+
+
+def over_time(cube, column, title):
+    from matplotlib.dates import YearLocator
+
+    fig, ax = pyplot().subplots(1, 1, figsize=(15, 7))
+    points = decimated(cube, column, 15)
+    ax.plot(points["month"], points[column], color="black")
+    ax.set_title(title)
+    ax.set_ylabel("number of cases")
+    ax.xaxis.set_major_locator(YearLocator())
+    mark_januaries(ax, cube)
+    return fig
+
+
+def seasonal_bars(cube, column, title):
+    averages = cube.seasonal[column]
+    fig, ax = pyplot().subplots(1, 1, figsize=(15, 7))
+    averages.plot.bar(ax=ax, color="gray", rot=0, xlabel="months", title=title)
+    averages.plot(ax=ax, color="black", linewidth=2, rot=0, xlabel="months", ylabel="average number of cases")
+    ax.axhline(y=int(averages.mean()), color="crimson", label="mean", linewidth=3, ls="--")
+    return fig
+
+
+def seasonal_pie(cube, column, colors, title):
+    fig, ax = pyplot().subplots(1, 1, figsize=(15, 7))
+    cube.seasonal[column].plot.pie(ax=ax, colors=list(colors), title=title)
+    ax.set_ylabel("")
+    return fig
+
+
+def seasonal_matrix(cube, column, title):
+    matrix = cube.seasonality.year_matrix(column)
+    fig, ax = pyplot().subplots(1, 1, figsize=(15, 7))
+    image = ax.imshow(matrix.to_numpy(), aspect="auto", cmap="Reds")
+    ax.set_xticks(range(0, 12), matrix.columns)
+    ax.set_yticks(range(0, len(matrix.index)), matrix.index)
+    ax.set_xlabel("months")
+    ax.set_title(title)
+    fig.colorbar(image, ax=ax, label="number of cases")
+    return fig
+
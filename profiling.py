@@ -0,0 +1,141 @@
+"""Timing instrumentation of the report.
+
+Code wraps its logical sections (loading, grouping, statistics, figure rendering) in ``with profile("name"):``.
+When profiling is enabled, every section records its wall time, the CPU time of its own thread (other sessions and
+background threads are not counted), and the memory allocated during it and at its peak (traced with
+``tracemalloc``). When it is disabled, ``profile`` returns a shared no-op context manager, so
+the instrumentation costs one attribute lookup per section.
+
+Profiling is enabled by the ``CRIME_PROFILE=1`` environment variable, or per app run (e.g. by the ``?profile=1``
+query parameter) through ``start_run``. Records are kept per thread, as Streamlit runs every session in its own
+thread. With ``CRIME_PROFILE_LOG=path`` every record is also appended to a JSON-lines file.
+
+Memory is traced only while at least one profiled section runs: tracing slows Python code down several times, so it
+is stopped as soon as the last profiled section of any thread ends, and unprofiled sessions do not pay for it.
+``tracemalloc`` counts the memory of the whole process, so while several threads run profiled sections at the same
+time their memory numbers include each other's allocations (and each resets the peak of the others); they are exact
+only for a single profiled session.
+
+Independently of that, ``record_startup`` keeps the cold start timings of the process (import time, time to the first
+rendered page), which are always printed to the server log once.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+ENABLED_BY_DEFAULT = os.environ.get("CRIME_PROFILE", "") not in ("", "0")
+LOG_PATH = os.environ.get("CRIME_PROFILE_LOG")
+
+_disabled = nullcontext()
+_log_lock = threading.Lock()
+_startup = {}
+_tracing_lock = threading.Lock()
+# Profiled sections running in all threads, and whether tracing was started by them (rather than by e.g. a benchmark).
+_traced_sections = 0
+_started_tracing = False
+
+
+class _State(threading.local):
+    def __init__(self):
+        self.enabled = ENABLED_BY_DEFAULT
+        self.run = None
+        self.records = []
+        self.stack = []
+
+
+_state = _State()
+
+
+def start_run(enabled=None):
+    """Forget the records of the previous run; ``enabled`` overrides the environment for this thread."""
+    _state.enabled = ENABLED_BY_DEFAULT if enabled is None else enabled
+    _state.run = f"{os.getpid()}-{threading.get_ident()}-{time.time():.3f}"
+    _state.records = []
+    _state.stack = []
+
+
+def enabled():
+    return _state.enabled
+
+
+def records():
+    return list(_state.records)
+
+
+def record_startup(**seconds):
+    """Record the cold start timings of the process (e.g. ``imports=0.7``); only the first call of a process counts."""
+    with _log_lock:
+        if _startup:
+            return
+        _startup.update(seconds)
+    print("startup: " + ", ".join(f"{name} {value:.2f} s" for name, value in seconds.items()), file=sys.stderr)
+    if LOG_PATH:
+        _log({"section": "startup", **{f"{name}_ms": value * 1000 for name, value in seconds.items()}})
+
+
+def startup():
+    return dict(_startup)
+
+
+def profile(name):
+    if not _state.enabled:
+        return _disabled
+    return _profiled(name)
+
+
+def _start_tracing():
+    global _traced_sections, _started_tracing
+    with _tracing_lock:
+        if _traced_sections == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _traced_sections += 1
+
+
+def _stop_tracing():
+    global _traced_sections, _started_tracing
+    with _tracing_lock:
+        _traced_sections -= 1
+        if _traced_sections == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+@contextmanager
+def _profiled(name):
+    outermost = not _state.stack
+    if outermost:
+        _start_tracing()
+    frame = {"child_peak": 0}
+    _state.stack.append(frame)
+    start_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - start_wall, time.thread_time() - start_cpu
+        current, peak = tracemalloc.get_traced_memory()
+        # Nested sections reset the peak, so the peak of a section also includes the peaks of its children.
+        peak = max(peak, frame["child_peak"])
+        _state.stack.pop()
+        if _state.stack:
+            _state.stack[-1]["child_peak"] = max(_state.stack[-1]["child_peak"], peak)
+        record = {"section": name, "depth": len(_state.stack), "wall_ms": wall * 1000, "cpu_ms": cpu * 1000,
+                  "allocated_mb": (current - start_memory) / 1024 / 1024,
+                  "peak_mb": (peak - start_memory) / 1024 / 1024}
+        _state.records.append(record)
+        if outermost:
+            _stop_tracing()
+        if LOG_PATH:
+            _log(record)
+
+
+def _log(record):
+    line = json.dumps(dict(record, run=_state.run, time=time.time()))
+    with _log_lock, open(LOG_PATH, "a") as file:
+        file.write(line + "\n")
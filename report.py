@@ -0,0 +1,120 @@
+"""Headless report builder.
+
+Builds the same analysis as the Streamlit app (the sections of ``sections.py``) into one static HTML file per input
+CSV, without running a server. The work is spread over a pool of worker processes:
+
+* with at least as many input files as workers, each task is a whole dataset (loaded, aggregated and rendered by one
+  worker), so every dataset is loaded once;
+* with fewer input files than workers, the sections of each dataset are built in a worker and then every figure is
+  rendered as a task of its own, so that a single input also uses every worker. Each worker process loads a dataset
+  at most once (``load_cube`` caches it per process), and the HTML is assembled by the parent.
+
+Usage: ``python report.py crime.csv [other.csv ...] [--output-dir reports] [--workers N]``
+
+The HTML files are self-contained (images are embedded) and can be printed to PDF from a browser.
+"""
+import argparse
+import base64
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from aggregation import load_cube
+from figure_cache import render_figure
+from sections import SECTIONS, Section, build_introduction, build_section, conclusion
+
+
+def render_task(task):
+    """Render one figure in a worker process; the worker loads (and caches) the dataset itself."""
+    path, plot, args = task
+    return render_figure(plot(load_cube(path), *args))
+
+
+def report_sections(path):
+    sections = [(None, build_introduction(path))]
+    sections += [(title, build_section(build, path)) for title, build in SECTIONS]
+    page = Section()
+    conclusion(page)
+    sections.append((None, page))
+    return sections
+
+
+def block_html(kind, content, images):
+    if kind == "title":
+        return f"<h1>{html.escape(content)}</h1>"
+    if kind == "text":
+        return f"<p>{html.escape(' '.join(str(part) for part in content))}</p>"
+    if kind == "preformatted":
+        return f"<pre>{html.escape(content)}</pre>"
+    if kind == "table":
+        table = content.to_frame() if isinstance(content, pd.Series) else content
+        return table.to_html(border=0)
+    image = base64.b64encode(next(images)).decode("ascii")
+    return f'<img src="data:image/png;base64,{image}" style="max-width: 100%">'
+
+
+def report_html(sections, images):
+    parts = []
+    for title, section in sections:
+        if title is not None:
+            parts.append(f"<h2>{html.escape(title)}</h2>")
+        parts.extend(block_html(kind, content, images) for kind, content in section.blocks)
+    body = "\n".join(parts)
+    return (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+            f"<title>Crimes dataset analysis</title>\n</head>\n<body>\n{body}\n</body>\n</html>\n")
+
+
+def report_figures(sections):
+    return [content for _, section in sections for kind, content in section.blocks if kind == "figure"]
+
+
+def write_report(path, sections, images, output_dir):
+    output = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + ".html")
+    with open(output, "w", encoding="utf-8") as file:
+        file.write(report_html(sections, images))
+    return output
+
+
+def build_report(path, output_dir):
+    """Write the HTML report of the CSV at ``path`` into ``output_dir`` and return its path."""
+    sections = report_sections(path)
+    cube = load_cube(path)
+    images = (render_figure(plot(cube, *args)) for plot, args in report_figures(sections))
+    return write_report(path, sections, images, output_dir)
+
+
+def build_reports(paths, output_dir, workers=None):
+    """Write one HTML report per CSV in ``paths`` into ``output_dir`` and return their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if len(paths) >= workers:
+            return list(pool.map(build_report, paths, [output_dir] * len(paths)))
+        reports = list(pool.map(report_sections, paths))
+        tasks = [(path, plot, args)
+                 for path, sections in zip(paths, reports) for plot, args in report_figures(sections)]
+        images = iter(pool.map(render_task, tasks))
+        return [write_report(path, sections, images, output_dir) for path, sections in zip(paths, reports)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build static HTML reports of the crimes analysis.")
+    parser.add_argument("paths", nargs="+", help="input CSV files")
+    parser.add_argument("--output-dir", default="reports", help="directory for the HTML files (default: reports)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes, each building whole reports (default: number of CPUs)")
+    arguments = parser.parse_args()
+    start = time.perf_counter()
+    for output in build_reports(arguments.paths, arguments.output_dir, arguments.workers):
+        print(output)
+    print(f"{len(arguments.paths)} report(s) in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
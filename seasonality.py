@@ -0,0 +1,92 @@
+"""Seasonality of every crime column at once.
+
+The engine starts from a single (years, 12 months, columns) array of monthly sums over the complete years and derives
+everything from it with whole-array NumPy operations, so one more column (or a few hundred) costs no extra passes:
+
+* ``averages``: average per month of the year (integer part, as in the rest of the report);
+* ``deviation``: difference of every monthly average from the column's mean of the averages;
+* ``peak`` / ``trough``: month of the year with the highest / lowest average;
+* ``index``: seasonal indices by the ratio-to-moving-average method, i.e. every month divided by the centred 2x12
+  moving average (which removes the trend), averaged per month of the year and normalised to a mean of 1.
+"""
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data import MONTH_NAMES
+
+
+def seasonal_indices(matrix):
+    """Ratio-to-moving-average seasonal indices, shape (12, columns), from monthly sums (years, 12, columns)."""
+    years, months, n_columns = matrix.shape
+    series = matrix.reshape(years * months, n_columns).astype(float)
+    n = len(series)
+    if n < months + 1:
+        return np.full((months, n_columns), np.nan)
+    cumulative = np.vstack([np.zeros(n_columns), np.cumsum(series, axis=0)])
+    # Centred 2x12 moving average: the mean of the two 12-month windows around each month (months 6 .. n - 7).
+    t = np.arange(6, n - 6)
+    trend = (cumulative[t + 6] - cumulative[t - 6] + cumulative[t + 7] - cumulative[t - 5]) / 24
+    ratio = np.full_like(series, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio[t] = np.where(trend != 0, series[t] / trend, np.nan)
+    # Columns that are zero throughout have no ratios at all; their indices are NaN ("Mean of empty slice").
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        per_month = np.nanmean(ratio.reshape(years, months, n_columns), axis=0)
+        return per_month / np.nanmean(per_month, axis=0)
+
+
+@dataclass(frozen=True)
+class Seasonality:
+    columns: list
+    years: list
+    matrix: np.ndarray
+    sums: np.ndarray
+    averages: np.ndarray
+    deviation: np.ndarray
+    peak: np.ndarray
+    trough: np.ndarray
+    index: np.ndarray
+
+    def frame(self, table):
+        """One of the (12, columns) tables (e.g. ``"averages"``) as a frame indexed by month names."""
+        return pd.DataFrame(getattr(self, table), index=pd.Index(MONTH_NAMES, name="month_only"),
+                            columns=self.columns)
+
+    def profile(self, column):
+        """Average, deviation from the mean and seasonal index of ``column`` for every month of the year."""
+        position = self.columns.index(column)
+        return pd.DataFrame({"average": self.averages[:, position], "deviation": self.deviation[:, position],
+                             "seasonal index": self.index[:, position].round(3)},
+                            index=pd.Index(MONTH_NAMES, name="month_only"))
+
+    def year_matrix(self, column):
+        """Sums of ``column`` with a row per year and a column per month of the year."""
+        return pd.DataFrame(self.matrix[:, :, self.columns.index(column)],
+                            index=pd.Index(self.years, name="year"), columns=MONTH_NAMES)
+
+    def peak_month(self, column):
+        return MONTH_NAMES[self.peak[self.columns.index(column)]]
+
+    def trough_month(self, column):
+        return MONTH_NAMES[self.trough[self.columns.index(column)]]
+
+
+def build_seasonality(matrix, years, columns):
+    """Engine for the monthly sums ``matrix`` of shape (len(years), 12, len(columns)) of complete years."""
+    sums = matrix.sum(axis=0)
+    averages = sums // max(len(years), 1)
+    return Seasonality(
+        columns=list(columns),
+        years=list(years),
+        matrix=matrix,
+        sums=sums,
+        averages=averages,
+        deviation=averages - averages.mean(axis=0),
+        peak=averages.argmax(axis=0),
+        trough=averages.argmin(axis=0),
+        index=seasonal_indices(matrix),
+    )
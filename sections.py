@@ -0,0 +1,359 @@
+"""Sections of the report.
+
+A section is built from the aggregation cube into a list of blocks (text, tables and figures) that do not depend on
+how they are displayed: the Streamlit app renders them with ``st.*`` calls and ``report.py`` writes them into a static
+HTML file. Built sections are kept per dataset content hash in ``shared.shared_store``, so opening a section again, in
+any session, costs only the rendering.
+"""
+import io
+import os
+
+import plots
+from aggregation import load_cube, round_percentage
+from data import data_fingerprint, load_crime_data, load_stream_summary
+from profiling import profile
+from shared import shared_store
+from snapshot import snapshot_value
+from streaming import should_stream
+
+
+class Section:
+    def __init__(self, blocks=()):
+        self.blocks = list(blocks)
+
+    def title(self, text):
+        self.blocks.append(("title", text))
+
+    def text(self, text):
+        self.blocks.append(("preformatted", text))
+
+    def write(self, *parts):
+        self.blocks.append(("text", parts))
+
+    def dataframe(self, table):
+        self.blocks.append(("table", table))
+
+    def figure(self, plot, *args):
+        self.blocks.append(("figure", (plot, args)))
+
+
+def introduction(page, df, summary=None):
+    # Built from the loaded frame only, so that it can be shown before any derived table is computed. For exports
+    # read in chunks, ``summary`` (a ``streaming.StreamSummary``) describes the rows before they were summed per month.
+    page.title("Crimes in Russia from 2003 to 2020 analysis")
+    page.write("In this project I'll work with a dataset containing crimes committed in Russia from 2003 to 2020. "
+               "The data is provided per month and it is sorted into multiple columns with different types of crime.")
+    if summary is not None:
+        page.write(f"This export has {summary.rows} rows, which were summed into {len(df)} months.")
+
+    page.write("Check if there are empty or 'NaN' cells in the dataset:")
+    page.dataframe(df.isna().sum() if summary is None else summary.nan_counts)
+    if summary is not None:
+        page.write("Statistics per row of the export:")
+        page.dataframe(summary.row_stats)
+    page.write("Check that data type is correct per column (in particular, for each column with numbers there are "
+               "no cells with numbers written not in int/float (no '1M' instead of 1000000 etc.)):")
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    page.text(buffer.getvalue())
+
+
+def all_crimes(page, cube):
+    monthly_stats = cube.monthly_stats
+    yearly_stats = cube.yearly_stats
+    page.write("Before starting to work on the dataset, I'd like to note that number of total crimes != sum of all "
+               "types, as types of crimes may intersect:")
+    df_sum = cube.totals.drop("Minor")
+    page.write("Total crimes minus all types of crimes' sum: ",
+               int(df_sum.Total_crimes - df_sum.drop("Total_crimes", axis=0).sum()))
+
+    page.write("After making sure that data is clean, let's look at the general trend of the dataset: number of total "
+               "crimes (some descriptive statistics and a plot to visualise the data). As obtained numbers will show "
+               "the mean/median/standart deviation of crimes, I will take integer part of them (for better "
+               "understanding, as crimes cannot be float).")
+    page.write("Mean: ", int(monthly_stats.Total_crimes["mean"]))
+    page.write("Median: ", int(monthly_stats.Total_crimes["median"]))
+    page.write("Standart deviation: ", int(monthly_stats.Total_crimes["std"]))
+
+    page.write("Per year for the whole time presented in the dataset:")
+    page.write("There is no column specifically with years in the dataset, so it was created while loading it (from "
+               "month column):")
+    page.dataframe(cube.monthly.drop("Minor", axis=1))
+    page.write("Now, sum statistics (for each column) for 12 months of each year:")
+    page.write("Notice that there is only January in 2020 statistics, therefore, to obtain valid data, we should "
+               "either exclude 2020 from per year sum statistics or multiply January results by 12 (months) -- which, "
+               "of course, would be an assumption and might not correspond with season dependent tendencies and, "
+               "consequently, will not be the strategy here (so let's exclude 2020 from per year statistics). Years "
+               "without all 12 months in the dataset (printed above) are excluded: ",
+               ", ".join(str(year) for year in cube.incomplete_years))
+    df_yearly = cube.yearly
+    page.dataframe(df_yearly.drop("Minor", axis=1))
+    page.write("Total crimes per year statistics:")
+    page.write("Mean: ", int(yearly_stats.Total_crimes["mean"]))
+    page.write("Median: ", int(yearly_stats.Total_crimes["median"]))
+    page.write("Standart deviation: ", int(yearly_stats.Total_crimes["std"]))
+
+    page.write("Now, after calculating some general variables for total crimes data, let's visualize the information. "
+               "The data from this column will be presented as number of crimes over time with an illustration of mean "
+               "as a horizontal line on the graph.")
+    page.write("Let's first do it for data per month:")
+    page.figure(plots.total_per_month)
+
+    page.write("Now, per year:")
+    page.figure(plots.yearly_trend, "Total_crimes", "All crimes per year")
+    page.write("The crime rate rises from 2003 to 2006 and declines after with a slight rise for 2015 and an even "
+               "smaller rise for 2019. It is possible to say that the trend is downward as the number of cases in 2003 "
+               "is higher than in 2019.")
+    page.write("Note that it's not possible to put all months of all the years on x axis (written on the plot). Also "
+               "notice that the per year graph represents the general trend (shown on per month graph as well) but "
+               "doesn't illustrate yearly fluctuations, which, as can be concluded from comparing per year and per "
+               "month plots, is not needed to be presented to understand the trend.")
+    page.write("So, all further time dependent plots will have years as x axis as it will provide essential "
+               "information and not overload the plot with details.")
+
+
+def fraud(page, cube):
+    monthly_stats = cube.monthly_stats
+    yearly_stats = cube.yearly_stats
+    page.write("We obtained a tendency in the amount of all crimes committed from 2003 to 2019. I think that while the "
+               "general trend is such, it is not true for some particular types of crimes. As an example, let's "
+               "analyse fraud. Assumption: on the contrary to the general trend, the number of scams has significantly "
+               "grown during these years.")
+    page.write("Mean per month: ", int(monthly_stats.Fraud_scam["mean"]))
+    page.write("Median per month: ", int(monthly_stats.Fraud_scam["median"]))
+    page.write("Standart deviation per month: ", int(monthly_stats.Fraud_scam["std"]))
+    page.write("Mean per year: ", int(yearly_stats.Fraud_scam["mean"]))
+    page.write("Median per year: ", int(yearly_stats.Fraud_scam["median"]))
+    page.write("Standart deviation per year: ", int(yearly_stats.Fraud_scam["std"]))
+    page.figure(plots.yearly_trend, "Fraud_scam", "Fraud per year", True, "gray", 3)
+    page.write("On the graph we can see an overall rise of fraud from 2003 to 2019 with a peak in 2006 (or, we can "
+               "say, a drop from 2006 to 2017). So the assumption was true.")
+
+
+def serious_crimes(page, cube):
+    monthly_stats = cube.monthly_stats
+    yearly_stats = cube.yearly_stats
+    df_yearly = cube.yearly
+    page.write("Let's now see whether the discovered trend for all crimes applies to serious crimes. Firstly, on the "
+               "whole.")
+    page.write("Mean per month: ", int(monthly_stats.Serious["mean"]))
+    page.write("Median per month: ", int(monthly_stats.Serious["median"]))
+    page.write("Standart deviation per month: ", int(monthly_stats.Serious["std"]))
+    page.write("Mean per year: ", int(yearly_stats.Serious["mean"]))
+    page.write("Median per year: ", int(yearly_stats.Serious["median"]))
+    page.write("Standart deviation per year: ", int(yearly_stats.Serious["std"]))
+    page.figure(plots.yearly_trend, "Serious", "Serious crimes per year")
+    page.write("The number of serious crimes generally declines from 2003 to 2019. There is no peak in 2006 like for "
+               "all crimes but there is a drop in 2004 and in 2005 the figure bounces back to nearly (*) 2003 value.")
+    page.write("*: ", int(df_yearly.Serious.iloc[0]), int(df_yearly.Serious.iloc[2]))
+
+    page.write("Secondly, for some particular types of serious crime, such as murder, crime causing serious harm to "
+               "health (drievous bodily harm) and rape. To compare the data, let's illustrate it on one graph. For a "
+               "fuller picture, I'll also add data on all serious crimes and on all crimes. For better comparison, "
+               "I'll use not numbers but percentage (of cases of each type of crime per year out of all cases of "
+               "according type from 2003 to 2019).")
+    page.write("Proportions:")
+    crimes = int(df_yearly.Total_crimes.sum())
+    serious = int(df_yearly.Serious.sum())
+    page.write("What percentage are serious crimes out of all: ", round_percentage(serious, crimes))
+    murder = int(df_yearly.Murder.sum())
+    harm_to_health = int(df_yearly.Harm_to_health.sum())
+    rape = int(df_yearly.Rape.sum())
+    page.write("Murder, causing harm to health and rape out of serious: ", round_percentage(murder, serious),
+               round_percentage(harm_to_health, serious), round_percentage(rape, serious))
+    page.write("Now, the plot:")
+
+    df_percent = cube.percent
+    page.dataframe(df_percent[["Total_crimes", "Serious", "Murder", "Harm_to_health", "Rape"]])
+    page.figure(plots.percent_lines, ("Total_crimes", "Serious", "Murder", "Harm_to_health", "Rape"),
+                ("gray", "lightpink", "darkred", "black", "crimson"), "Serious crimes comparison")
+    page.write("Line graph was for better illustration, bar chart is more convenient for description of trends")
+    page.figure(plots.percent_bars, ((("Total_crimes", "Serious"), ("gray", "lightpink"),
+                                      "Serious and all crimes comparison"),
+                                     (("Total_crimes", "Serious", "Murder", "Harm_to_health", "Rape"),
+                                      ("darkred", "brown", "indianred", "lightcoral", "pink"),
+                                      "Serious crimes comparison")))
+
+    page.write("From year 2015 the per year percentage of all crimes stays the highest (from 2010 -- higher than "
+               "serious in total). This means that the relative amount of serious crimes (on the whole and for each "
+               "illustrated type) has lowered more than crimes have in general. At the same time, less crimes out af "
+               "all committed from 2003 to 2019 were committed from 2003 to 2007 than serious (out of all serious from "
+               "2003 to 2009) were committed in that period of time: the darkest column is lower than others from 2003 "
+               "to 2007. So the 2006 peak in all crimes was created not by serious crimes, except for maybe rape (the "
+               "only peaking in 2006 here, but its percentage out of all is too small to cause the peak for all "
+               "crimes*). So serious crimes have approximately the same tendency as crimes on the whole from 2007 to "
+               "2015. The most drastic decline was in murder (the middle in color chart): from the highest of all in "
+               "percentage to the lowest. A slight drop of serious crimes in 2004 was not a decrease in murder, rape "
+               "or causing serious harm to health crimes (there is drop in the column for serious crimes and no drop "
+               "in murder, rape or causing serious harm to health crimes).")
+    page.write("*: ", round_percentage(rape, crimes))
+
+
+def minor_crimes(page, cube):
+    df_yearly = cube.yearly
+    crimes = int(df_yearly.Total_crimes.sum())
+    page.write("Let's then compare all crimes and ones not considered major. To obtain such statistics, I'll substract "
+               "serious from total (so it will approximately (due to the possible intersection) be 'non-serious', "
+               "minor).")
+    page.dataframe(df_yearly)
+
+    page.write("Proportion:")
+    minor = int(df_yearly.Minor.sum())
+    page.write(round_percentage(minor, crimes))
+    page.write("Plots:")
+
+    page.figure(plots.percent_lines, ("Total_crimes", "Minor"), ("gray", "lightpink"),
+                "Minor and all crimes comparison")
+
+    page.figure(plots.percent_bars, ((("Total_crimes", "Minor"), ("gray", "lightpink"),
+                                      "Minor and all crimes comparison"),))
+
+    page.write("Being the major part of crimes in total (73.31%), crimes not considered serious in the dataset follow "
+               "the same trend as crimes on the whole, the peak in 2006 included. We can notice that from 2010 bigger "
+               "percentages of non-serious crimes out of all non-serious (from 2003 to 2019) are committed per year "
+               "than the percentages of crimes in total out of all crimes committed (minor column higher than total). "
+               "The opposite is true for 2003-2007. This verifies information from previous plots.")
+
+
+def rape_seasonality(page, cube):
+    page.write("Now I'll try to analyse fluctuations depending on the month of the year (seasonal).")
+    page.write("Here, hypothesis: the amount of rape is higher in colder season than in warmer season each year.")
+    page.write("Firstly, let's look at statistics for each month:")
+
+    page.figure(plots.over_time, "Rape", "Rape over time")
+
+    page.write("Each yearly fluctuation peaks in the middle of the year, so nearly each year the quantity of the crime "
+               "is the lowest closer to the start and to the end and the highest in the middle, so is lower around "
+               "January and higher around July. Although the general tendency is such, there are a few exceptions: the "
+               "highest number of 2016 is in the beginning of the year; 2016 also has a peak nearer its end; 2019 has "
+               "a rise at the beginning (though the figure is still not as high as in the middle); 2019 ends with an "
+               "increase; in 2005 and 2006 there is a drop (with immediate rise) in the middle of the year.")
+    page.write("Let's then calculate average statistic for each month:")
+    page.write("A column specifically for months was created while loading the dataset, so let's group the data by it "
+               "and create a 'seasonal' dataset:")
+    page.dataframe(cube.monthly)
+    # Only complete years are grouped (only January in 2020 in the dataset), averages are obtained from the sums
+    df_seasonal = cube.seasonal
+    df_for_hypothesis = df_seasonal["Rape"]
+    page.dataframe(df_for_hypothesis)
+    mean = int(df_for_hypothesis.mean())
+    page.write("Mean: ", mean)
+
+    page.write("Let's visualize the data:")
+    page.figure(plots.seasonal_bars, "Rape", "Seasonal dependence of rape")
+
+    page.write("The hypothesis seems to be true: the amount of cases of rape in average for each month of the year "
+               "increases from January to July (with an exception of April being slightly lower than March (*)) and "
+               "decreases from July to December. The biggest figure is in July and the lowest is in January. Higher "
+               "than mean are months from May to October(**).")
+    page.write("*: ", int(df_for_hypothesis["Apr"]), int(df_for_hypothesis["Mar"]))
+    page.write("** October and mean: ", int(df_for_hypothesis["Oct"]), mean)
+
+    page.write("Pie chart:")
+    # different color for the highest/the lowest, then colors for 2 around it, then depending on higher/lower than mean.
+    colors = ("darkred", "brown", "indianred", "indianred", "lightcoral", "pink", "mistyrose", "pink",
+              "lightcoral", "lightcoral", "indianred", "brown")
+    page.figure(plots.seasonal_pie, "Rape", colors, "Seasonal distribution of rape")
+    page.write("So, the closer the month to winter the less rape committed (small exception: in April slightly less. "
+               "Then, if we assume that the middle month of the coldest / the warmest season is the coldest / the "
+               "warmest, the colder the weather the less rape committed.")
+    page.write("So, the hypothesis was proved to be generally true, though with exception for some years and for the "
+               "difference between March and April.")
+
+
+def murder_seasonality(page, cube):
+    df_seasonal = cube.seasonal
+    page.write("Another hypothesis concerning seasonal fluctuations: the highest number of cases of murder is on the "
+               "first of January, so, speaking for months, in January.")
+    page.figure(plots.over_time, "Murder", "Murder over time")
+
+    page.write("Generally the beginning of the year has higher rates than the end. It partially correlates with an "
+               "overall downward trend, but after a drop in the middle of the year or closer to its end, the numbers "
+               "rise again, so the described tendency cannot be a result of only the general decrease.")
+    df_for_hypothesis2 = df_seasonal["Murder"]
+    page.dataframe(df_for_hypothesis2)
+    mean2 = int(df_for_hypothesis2.mean())
+    page.write("Mean: ", mean2)
+    page.figure(plots.seasonal_bars, "Murder", "Seasonal dependence of murder")
+
+    page.write("The highest are columns for spring months and January. Overall, the second part of the year has lower "
+               "number of cases than the first, as the second is lower than the mean and the first is higher. So there "
+               "is on average less murder after June. So, as the trend for a year on average corresponds with the "
+               "general downward trend of murder from 2003 to 2019, the results cannot clearly imply seasonal "
+               "dependency such as higher in the first part of the year and lower in the second. At the same time, I "
+               "think that the hypothesis can be considered partially true: the conclusion from the bar chart is that "
+               "the highest number of cases of murder of the year happen in January and in spring (the highest is in "
+               "March).")
+
+
+def seasonal_profile(page, cube, column):
+    seasonality = cube.seasonality
+    page.write(f"Average number of cases of {column} for each month of the year (over {cube.n_years} complete "
+               "years), its deviation from the mean of the averages and the seasonal index (the month divided by the "
+               "centred 12 months moving average, so that the overall trend is removed; 1 is an average month):")
+    page.dataframe(seasonality.profile(column))
+    page.write(f"The highest average is in {seasonality.peak_month(column)}, the lowest is in "
+               f"{seasonality.trough_month(column)}.")
+    page.figure(plots.seasonal_bars, column, f"Seasonal dependence of {column}")
+    page.write("Per year:")
+    page.figure(plots.seasonal_matrix, column, f"{column} per month of each year")
+    page.dataframe(seasonality.year_matrix(column))
+
+
+def conclusion(page):
+    page.write("Conclusion:")
+    page.write("The tendencies in the amount of crimes of various types committed from 2003 to 2019 (January of 2020) "
+               "can be divided into two categories: over time and seasonal. Firstly, about the first category. The "
+               "overall crime rate was down from from 2003 to 2019 but with a peak in 2006. Not all crimes follow the "
+               "same trend, for example, there was a rise in fraud. The amount of cases of serious crimes decreased "
+               "more than the amount of crimes on the whole, from being higher to being lower than them. Secondly, I "
+               "tried to analyse two types of crimes for seasonal dependency (having set two hypothesis). On average, "
+               "more rape was committed in summer than in winter: the closer the month was to January (from July), the "
+               "more rape was committed on average during that month. Concerning murder, in my opinion, it is more "
+               "difficult to say what is its month dependent tendency and what follows from its overall drop. However, "
+               "statistically more murder was on average committed in spring and January.")
+
+
+SECTIONS = [
+    ("All crimes", all_crimes),
+    ("Fraud", fraud),
+    ("Serious crimes", serious_crimes),
+    ("Minor crimes", minor_crimes),
+    ("Seasonality of rape", rape_seasonality),
+    ("Seasonality of murder", murder_seasonality),
+]
+
+
+def build_section(build, path="crime.csv", *args):
+    """Blocks of the section ``build`` (with extra ``args``) for the dataset at ``path``, built once per content."""
+    digest = data_fingerprint(path)
+
+    def blocks():
+        stored = snapshot_value(path, (build.__name__,) + args, digest)
+        if stored is not None:
+            return stored
+        section = Section()
+        cube = load_cube(path)
+        with profile(f"section: {build.__name__}"):
+            build(section, cube, *args)
+        return section.blocks
+
+    key = ("section", build.__name__, os.path.abspath(path)) + args
+    return Section(shared_store.get(key, digest, blocks))
+
+
+def build_introduction(path="crime.csv"):
+    """Blocks of the introduction for the dataset at ``path``, built once per content."""
+    digest = data_fingerprint(path)
+
+    def blocks():
+        stored = snapshot_value(path, ("introduction",), digest)
+        if stored is not None:
+            return stored
+        section = Section()
+        summary = load_stream_summary(path) if should_stream(path) else None
+        with profile("section: introduction"):
+            introduction(section, load_crime_data(path), summary)
+        return section.blocks
+
+    return Section(shared_store.get(("section", "introduction", os.path.abspath(path)), digest, blocks))
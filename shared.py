@@ -0,0 +1,183 @@
+"""Process-wide read-only store of the loaded data and the results derived from it.
+
+Streamlit runs the app script once per browser session, each in its own thread of the same server process, so the
+loaded frame, the cube of derived tables, the built sections and the dataset digests are kept here once per process
+and shared by every session instead of being computed and held per session:
+
+* entries are stored under a key (e.g. the dataset path) with a version (e.g. the dataset content hash); asking for
+  another version recomputes the entry and replaces the old one;
+* concurrent first requests for the same key and version are single-flighted: one thread computes the value while
+  the others wait for it and get the same result (or the same exception);
+* stored values are frozen (NumPy arrays are made read-only) and callers only get views of them: frames and series
+  are shallow copies, which share the memory of the stored ones but, with pandas copy-on-write (always on since
+  pandas 3, hence ``pandas>=3`` in ``requirements.txt``), copy it as soon as a session modifies them, and lists
+  become tuples. A session can therefore never change what the others see;
+* the estimated size of the entries is bounded by ``CRIME_SHARED_MB`` (512 by default); beyond it the least recently
+  used entries are dropped (sessions still holding views of them keep that memory alive until they finish).
+
+The memory of a server process is therefore bounded by about ``CRIME_SHARED_MB`` + ``CRIME_FIGURE_CACHE_MB`` (64 by
+default, see ``figure_cache.py``) + the interpreter and libraries (about 250 MB for Streamlit, pandas and matplotlib)
++ what is being computed at the moment: at most one computation per entry, whatever the number of sessions, plus the
+widgets and messages of each session, which do not hold copies of the data.
+"""
+import dataclasses
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.environ.get("CRIME_SHARED_MB", "512")) * 1024 * 1024
+
+
+def freeze(value):
+    """Make the arrays of ``value`` read-only, in place, and return it."""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        for field in dataclasses.fields(value):
+            freeze(getattr(value, field.name))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    return value
+
+
+def view(value):
+    """Read-only view of a stored value; modifying it never changes the stored one."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.replace(value, **{field.name: view(getattr(value, field.name))
+                                             for field in dataclasses.fields(value) if field.init})
+    if isinstance(value, (list, tuple)):
+        return tuple(view(item) for item in value)
+    if isinstance(value, dict):
+        return {key: view(item) for key, item in value.items()}
+    return value
+
+
+def size_of(value):
+    """Estimated memory held by ``value``, in bytes (shared memory is counted once per holder)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sum(size_of(getattr(value, field.name)) for field in dataclasses.fields(value))
+    if isinstance(value, (list, tuple)):
+        return sum(size_of(item) for item in value)
+    if isinstance(value, dict):
+        return sum(size_of(item) for item in value.values())
+    return 0
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time; concurrent callers with the same key share its result."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, compute):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+
+class SharedStore:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.computations = 0
+        self._entries = OrderedDict()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _compute(self, key, version, compute):
+        # Another thread may have finished the same computation between the lookup and the start of this flight.
+        entry = self._lookup(key, version)
+        if entry is not None:
+            return entry[1]
+        value = compute()
+        with self._lock:
+            self.computations += 1
+        return self.put(key, version, value)
+
+    def put(self, key, version, value):
+        """Store ``value`` under ``key`` for ``version`` (e.g. a result read from disk) and return it, frozen."""
+        value = freeze(value)
+        size = size_of(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self._entries[key] = (version, value, size)
+            self.size += size
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+        return value
+
+    def get(self, key, version, compute):
+        """View of the value stored under ``key`` for ``version``; ``compute()`` is only called on a miss."""
+        entry = self._lookup(key, version)
+        if entry is not None:
+            return view(entry[1])
+        return view(self._flights.run((key, version), lambda: self._compute(key, version, compute)))
+
+    def take(self, key, version):
+        """Remove the value stored under ``key`` for ``version`` and return it (not a view), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            del self._entries[key]
+            self.size -= entry[2]
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+shared_store = SharedStore()
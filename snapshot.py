@@ -0,0 +1,155 @@
+"""Persisted snapshot of the analysis, for fast cold starts.
+
+A new server process would otherwise load the dataset and compute the cube and every section before it can serve
+them. Instead, the results (the cube, the blocks of the introduction and of every section, including the seasonal
+profile of every column) are pickled once into ``<name>.<hash>.snapshot`` next to the CSV (or into
+``CRIME_SNAPSHOT_DIR``), keyed by the content hash of the dataset. When the snapshot of the current content exists,
+it is read once per process and each of its results is put into the shared store under its own key (so it counts
+towards ``CRIME_SHARED_MB``), from where ``aggregation.load_cube`` and ``sections.build_section`` take it over instead
+of computing it. When it does not exist, ``ensure_snapshot`` builds it in a background thread, which also warms the
+shared store of the running process.
+
+A snapshot is ignored when the code that computes the results has changed since it was written. Snapshots are
+pickles, so the directory must only be writable by the app.
+
+Usage: ``python snapshot.py crime.csv [other.csv ...]`` builds the snapshots ahead of a deployment.
+"""
+import glob
+import os
+import pickle
+import sys
+import threading
+import traceback
+
+from data import data_fingerprint, source_version
+from profiling import profile
+from shared import shared_store
+
+SNAPSHOT_DIR = os.environ.get("CRIME_SNAPSHOT_DIR")
+SNAPSHOT_SUFFIX = ".snapshot"
+# Modules whose code determines the stored results.
+SOURCE_MODULES = ["data", "store", "streaming", "seasonality", "aggregation", "sections"]
+
+_building = set()
+_building_lock = threading.Lock()
+
+
+def code_version():
+    return source_version(SOURCE_MODULES)
+
+
+def snapshot_path(csv_path, digest):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    directory = SNAPSHOT_DIR or os.path.dirname(os.path.abspath(csv_path))
+    return os.path.join(directory, f"{stem}.{digest[:16]}{SNAPSHOT_SUFFIX}")
+
+
+def read_snapshot(csv_path, digest):
+    """Stored results for the dataset content ``digest``, or None when there is no valid snapshot."""
+    path = snapshot_path(csv_path, digest)
+    if not os.path.exists(path):
+        return None
+    with profile("snapshot"):
+        try:
+            with open(path, "rb") as file:
+                snapshot = pickle.load(file)
+        except Exception:
+            # Unreadable or written by code that no longer exists (e.g. a renamed plot); it will be rebuilt.
+            return None
+    if snapshot.get("digest") != digest or snapshot.get("code") != code_version():
+        return None
+    return snapshot["values"]
+
+
+def _put_snapshot(csv_path, digest):
+    values = read_snapshot(csv_path, digest)
+    if values is None:
+        return False
+    for name, value in values.items():
+        shared_store.put(("snapshot", os.path.abspath(csv_path), name), digest, value)
+    return True
+
+
+def load_snapshot(csv_path, digest):
+    """Whether there is a valid snapshot for ``digest``; its file is only read once per process."""
+    return shared_store.get(("snapshot", os.path.abspath(csv_path)), digest, lambda: _put_snapshot(csv_path, digest))
+
+
+def snapshot_value(csv_path, name, digest):
+    """Result ``name`` (``"cube"`` or a section key) of the snapshot of ``csv_path``, or None.
+
+    The result is handed over once: it is removed from the snapshot entries, as the caller stores it under its own key.
+    """
+    if not load_snapshot(csv_path, digest):
+        return None
+    return shared_store.take(("snapshot", os.path.abspath(csv_path), name), digest)
+
+
+def write_snapshot(csv_path, digest, values):
+    path = snapshot_path(csv_path, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump({"digest": digest, "code": code_version(), "values": values}, file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    # Snapshots of previous contents of the same dataset are never used again.
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    pattern = f"{glob.escape(stem)}.{'[0-9a-f]' * 16}{SNAPSHOT_SUFFIX}"
+    for old in glob.glob(os.path.join(os.path.dirname(path), pattern)):
+        if old != path:
+            os.remove(old)
+    return path
+
+
+def build_snapshot(csv_path):
+    """Compute every result for the dataset at ``csv_path`` and write its snapshot; returns its path."""
+    from aggregation import load_cube
+    from sections import SECTIONS, build_introduction, build_section, seasonal_profile
+
+    digest = data_fingerprint(csv_path)
+    cube = load_cube(csv_path)
+    values = {"cube": cube, ("introduction",): build_introduction(csv_path).blocks}
+    for _, build in SECTIONS:
+        values[(build.__name__,)] = build_section(build, csv_path).blocks
+    for column in cube.columns:
+        values[("seasonal_profile", column)] = build_section(seasonal_profile, csv_path, column).blocks
+    if data_fingerprint(csv_path) != digest:
+        # The dataset changed while the results were computed; the next run builds the snapshot of the new content.
+        return None
+    return write_snapshot(csv_path, digest, values)
+
+
+def _build_in_background(csv_path):
+    try:
+        build_snapshot(csv_path)
+    except Exception:
+        print(f"Building the snapshot of {csv_path} failed:", file=sys.stderr)
+        traceback.print_exc()
+
+
+def ensure_snapshot(csv_path):
+    """Start building the snapshot of ``csv_path`` in a background thread unless it exists or is being built.
+
+    Returns the thread, or None when nothing has to be built. Every dataset content is built at most once per process.
+    """
+    digest = data_fingerprint(csv_path)
+    if load_snapshot(csv_path, digest):
+        return None
+    key = (os.path.abspath(csv_path), digest)
+    with _building_lock:
+        if key in _building:
+            return None
+        _building.add(key)
+    thread = threading.Thread(target=_build_in_background, args=(csv_path,), name="snapshot", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    for csv_path in sys.argv[1:] or ["crime.csv"]:
+        print(build_snapshot(csv_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Columnar on-disk copy of the crimes dataset.
+
+The CSV is converted once into an uncompressed Arrow IPC (Feather v2) file next to it: counts are stored as integer
+columns and the month as a timestamp index. Reading memory-maps the file and only touches the requested columns, so
+a caller that needs only ``Murder`` does not read the other columns. The app and the report do not use this: their
+cube aggregates every column at once, so they read the whole file (once per process, or not at all when the
+analysis snapshot exists). The CSV stays the source of truth: the store records the content hash of the CSV it was
+built from (in its schema metadata) and is rebuilt automatically whenever the CSV's content differs, whatever the
+modification times say (e.g. after ``cp -p``, ``rsync -t`` or restoring an older export). The CSV is read directly
+when pyarrow is not installed.
+
+Usage: ``python store.py crime.csv [other.csv ...]``
+"""
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from data import DATE_COLUMN, DERIVED_COLUMNS, add_calendar_columns, current_digest, parse_crime_csv, select_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+STORE_SUFFIX = ".arrow"
+# Schema metadata key holding the content hash of the CSV the store was built from.
+DIGEST_KEY = b"crime_csv_digest"
+
+
+def store_path(csv_path):
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+def convert(csv_path, path=None):
+    """Write the columnar copy of ``csv_path`` and return its path."""
+    if pa is None:
+        raise RuntimeError("pyarrow is required to build the columnar store")
+    path = path or store_path(csv_path)
+    # Hashed before parsing: if the CSV changes meanwhile, the store is marked as built from the old content and the
+    # next load rebuilds it.
+    digest = current_digest(csv_path)
+    df = parse_crime_csv(csv_path).drop(columns=DERIVED_COLUMNS).set_index(DATE_COLUMN)
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), DIGEST_KEY: digest.encode()})
+    # Written next to the target and renamed, so that readers never map a partially written file.
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary, path)
+    return path
+
+
+def read_store(path, columns=None, digest=None):
+    """Frame read from the store at ``path``, memory-mapped, with only ``columns`` (all when None).
+
+    With ``digest``, returns None when the store was built from a CSV with other content.
+    """
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        if digest is not None and (reader.schema.metadata or {}).get(DIGEST_KEY) != digest.encode():
+            return None
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select([DATE_COLUMN] + [column for column in columns if column != DATE_COLUMN])
+        # split_blocks keeps one block per column, so integer columns without gaps are not copied.
+        df = table.to_pandas(split_blocks=True)
+    # The date index is turned back into the first column by a concat: reset_index would insert it into a frame with
+    # one block per column, which pandas warns about on wide exports.
+    return add_calendar_columns(pd.concat([df.index.to_frame(index=False), df.reset_index(drop=True)], axis=1))
+
+
+def load_columns(csv_path, columns=None):
+    """Frame for ``csv_path`` from its columnar store, rebuilt first when it was built from other content.
+
+    A store that is missing, unreadable (e.g. truncated) or stale is rebuilt once. Falls back to parsing the CSV when
+    pyarrow is not installed or the store cannot be written or read.
+    """
+    if pa is not None:
+        path = store_path(csv_path)
+        digest = current_digest(csv_path)
+        try:
+            try:
+                df = read_store(path, columns, digest)
+            except (OSError, pa.ArrowException):
+                df = None
+            if df is None:
+                convert(csv_path, path)
+                df = read_store(path, columns, digest)
+            if df is not None:
+                return df
+        except (OSError, pa.ArrowException):
+            pass
+    return select_columns(parse_crime_csv(csv_path), columns)
+
+
+if __name__ == "__main__":
+    for csv_path in sys.argv[1:] or ["crime.csv"]:
+        print(convert(csv_path))
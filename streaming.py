@@ -0,0 +1,212 @@
+"""Chunked ingestion of crime exports that are too large to be loaded whole.
+
+The CSV is read in chunks and only bounded state is kept while reading:
+
+* running count/mean/variance of every count column (Welford's method, merged chunk by chunk with Chan's formula);
+* a quantile sketch per column for medians and other quantiles;
+* NaN counts per column;
+* partial sums per (year, month), from which the yearly and seasonal tables are derived.
+
+The per (year, month) sums form a monthly frame with the same layout as ``data.load_crime_data``, so per-day or
+per-region exports are reduced to the monthly series the report works with.
+
+Tolerances against the in-memory path (``pandas`` on the whole file):
+
+* counts, NaN counts and all sums are exact (integers summed in float64 are exact below 2**53);
+* mean and standard deviation agree up to floating point rounding (relative difference below 1e-9);
+* quantiles are exact while a column has at most ``sketch_size`` values (then ``np.quantile`` with linear
+  interpolation is used, like ``pandas.Series.median``); beyond that the sketch returns a value whose rank is
+  within about ``2 / sketch_size`` of the requested one (below 0.1% with the default size of 4096).
+
+``check_tolerances`` verifies them on a given file; ``python streaming.py crime.csv [--chunk-size N]`` runs it from
+the command line (and ``benchmark.py`` runs it on every synthetic dataset).
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data import DATE_COLUMN, DATE_FORMAT, add_calendar_columns, compact_counts
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+DEFAULT_SKETCH_SIZE = 4096
+
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations of every column, updated one block of rows at a time."""
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, block):
+        present = ~np.isnan(block)
+        count = present.sum(axis=0).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, np.nansum(block, axis=0) / count, 0.0)
+        m2 = np.nansum((block - mean) ** 2, axis=0)
+
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta ** 2 * self.count * count / total, 0.0)
+        self.count = total
+
+    def std(self, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > ddof, np.sqrt(self.m2 / (self.count - ddof)), np.nan)
+
+
+class QuantileSketch:
+    """Quantile sketch (a KLL-style hierarchy of compactors).
+
+    Values are buffered at level 0; whenever a level holds more than ``size`` values it is sorted and every other
+    value (from a random offset) is promoted to the next level, where it stands for twice as many original values.
+    """
+
+    def __init__(self, size=DEFAULT_SKETCH_SIZE, seed=0):
+        self.size = size
+        self.levels = [np.empty(0)]
+        self._random = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.size:
+                items = np.sort(items)
+                paired = len(items) - len(items) % 2
+                promoted = items[self._random.integers(2):paired:2]
+                self.levels[level] = items[paired:]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q)) if len(self.levels[0]) else np.nan
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(values[order][min(position, len(values) - 1)])
+
+
+@dataclass
+class StreamSummary:
+    rows: int
+    nan_counts: pd.Series
+    row_stats: pd.DataFrame
+    monthly: pd.DataFrame
+
+
+def stream_crime_csv(path, chunk_size=DEFAULT_CHUNK_SIZE, sketch_size=DEFAULT_SKETCH_SIZE):
+    """Read the export at ``path`` chunk by chunk and summarise it with bounded memory."""
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [column for column in header if column != DATE_COLUMN]
+    dtypes = {column: "float64" for column in columns}
+    dtypes[DATE_COLUMN] = "str"
+
+    rows = 0
+    nan_counts = np.zeros(len(columns), dtype=np.int64)
+    moments = RunningMoments(len(columns))
+    sketches = [QuantileSketch(sketch_size, seed=index) for index in range(len(columns))]
+    sums = None
+
+    for chunk in pd.read_csv(path, dtype=dtypes, chunksize=chunk_size):
+        block = chunk[columns].to_numpy()
+        rows += len(block)
+        nan_counts += np.isnan(block).sum(axis=0)
+        moments.update(block)
+        for index, sketch in enumerate(sketches):
+            sketch.update(block[:, index])
+        # Exports may have several rows per month (per day or per region); they are summed into their month,
+        # grouped on integer month numbers (year * 12 + month - 1), which is much faster than grouping on periods.
+        dates = pd.to_datetime(chunk[DATE_COLUMN], format=DATE_FORMAT)
+        months = dates.dt.year.to_numpy() * 12 + dates.dt.month.to_numpy() - 1
+        partial = chunk[columns].groupby(months).sum(min_count=1)
+        sums = partial if sums is None else sums.add(partial, fill_value=0)
+
+    row_stats = pd.DataFrame([moments.mean, [sketch.quantile(0.5) for sketch in sketches], moments.std()],
+                             index=["mean", "median", "std"], columns=columns)
+    monthly = sums.sort_index() if sums is not None else pd.DataFrame(columns=columns, index=pd.Index([], dtype=int))
+    months = monthly.index.to_numpy()
+    dates = pd.to_datetime(pd.DataFrame({"year": months // 12, "month": months % 12 + 1, "day": 1}))
+    # Built at once: inserting the converted columns one by one fragments wide exports.
+    monthly = pd.DataFrame({DATE_COLUMN: dates,
+                            **{column: compact_counts(monthly[column]).to_numpy() for column in columns}})
+    return StreamSummary(rows=rows, nan_counts=pd.Series(nan_counts, index=columns), row_stats=row_stats,
+                         monthly=add_calendar_columns(monthly))
+
+
+def should_stream(path, threshold=None):
+    """Whether ``path`` is large enough to be read in chunks (``CRIME_STREAMING_MB``, 256 MB by default)."""
+    if threshold is None:
+        threshold = float(os.environ.get("CRIME_STREAMING_MB", "256")) * 1024 * 1024
+    return os.path.getsize(path) > threshold
+
+
+def check_tolerances(path, chunk_size=DEFAULT_CHUNK_SIZE, sketch_size=DEFAULT_SKETCH_SIZE):
+    """Differences of ``stream_crime_csv`` from pandas on the whole file beyond the documented tolerances."""
+    summary = stream_crime_csv(path, chunk_size, sketch_size)
+    df = pd.read_csv(path, dtype={DATE_COLUMN: "str"})
+    columns = list(summary.nan_counts.index)
+    values = df[columns].astype(float)
+    found = []
+    if summary.rows != len(df):
+        found.append(f"rows: {summary.rows} != {len(df)}")
+    for column, (streamed, expected) in enumerate(zip(summary.nan_counts, values.isna().sum())):
+        if streamed != expected:
+            found.append(f"{columns[column]} NaN count: {streamed} != {expected}")
+    months = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT).dt.to_period("M").dt.to_timestamp()
+    sums = values.groupby(months.to_numpy()).sum(min_count=1)
+    streamed_sums = summary.monthly.set_index(DATE_COLUMN)[columns].astype(float)
+    if not streamed_sums.index.equals(sums.index) or not np.array_equal(streamed_sums.to_numpy(), sums.to_numpy(),
+                                                                        equal_nan=True):
+        found.append("monthly sums differ")
+    for statistic, expected in (("mean", values.mean()), ("std", values.std())):
+        streamed = summary.row_stats.loc[statistic]
+        if not np.allclose(streamed, expected, rtol=1e-9, atol=0, equal_nan=True):
+            found.append(f"{statistic}: largest relative difference {np.nanmax(np.abs(streamed / expected - 1)):.2e}")
+    for column in columns:
+        present = np.sort(values[column].dropna().to_numpy())
+        median = summary.row_stats.loc["median", column]
+        if len(present) <= sketch_size:
+            if not np.isclose(median, np.median(present), rtol=1e-12, equal_nan=True):
+                found.append(f"{column} median: {median} != {np.median(present)}")
+            continue
+        # Rank error: how far 0.5 is from the range of ranks the estimate covers.
+        low = np.searchsorted(present, median, side="left") / len(present)
+        high = np.searchsorted(present, median, side="right") / len(present)
+        error = max(0.0, low - 0.5, 0.5 - high)
+        if error > 2 / sketch_size:
+            found.append(f"{column} median: rank error {error:.2e} > {2 / sketch_size:.2e}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the chunked loader against pandas on whole files.")
+    parser.add_argument("paths", nargs="+", help="input CSV files")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--sketch-size", type=int, default=DEFAULT_SKETCH_SIZE)
+    arguments = parser.parse_args()
+    failed = False
+    for path in arguments.paths:
+        found = check_tolerances(path, arguments.chunk_size, arguments.sketch_size)
+        print(f"{path}: " + ("within tolerances" if not found else "; ".join(found)))
+        failed = failed or bool(found)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()